@@ -1,14 +1,163 @@
 #!/usr/bin/env python3
 
-from generate_interactive_html import load_all_coverage_data, load_config
+from generate_interactive_html import cached_load_coverage_data, cached_load_config
 import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import itemgetter
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+def _segment_boundaries(contig_length, num_segments):
+    """num_segments + 1 evenly spread integer boundaries from 0 to contig_length, like np.linspace"""
+    return np.arange(num_segments + 1, dtype=np.int64) * contig_length // num_segments
+
+def _compute_segment_means(contig_data, contig_length, num_segments):
+    """Mean coverage of every sample in every segment as a (num_segments, num_samples) matrix.
+    
+    Segment i covers [boundaries[i], boundaries[i + 1]) of _segment_boundaries, so positions
+    at or past contig_length are not counted. Segments in which a sample has no positions
+    are NaN. Each sample's positions must be sorted.
+    """
+    boundaries = _segment_boundaries(contig_length, num_segments)
+    samples = list(contig_data)
+    arrays = list(contig_data.values())
+    
+    # Shifting sample s by s * stride makes the concatenated positions one sorted key array,
+    # so every (sample, segment) boundary comes out of a single searchsorted
+    stride = max([contig_length + 1] + [int(arr.pos[-1]) + 1 for arr in arrays if arr.pos.size])
+    sample_base = np.arange(len(samples), dtype=np.int64) * stride
+    keys = np.repeat(sample_base, [arr.pos.size for arr in arrays]) + np.concatenate([arr.pos for arr in arrays])
+    # Each sample gets one extra trailing slot for positions >= contig_length, dropped below
+    cuts = sample_base[:, None] + boundaries
+    bounds = np.append(np.searchsorted(keys, cuts.ravel()), keys.size)
+    counts = np.diff(bounds)
+    sums = np.zeros(counts.size)
+    filled = counts > 0
+    if filled.any():
+        # Empty segments start where the next one does, so reducing at the filled starts sums each slice
+        cov = np.concatenate([arr.cov for arr in arrays])
+        sums[filled] = np.add.reduceat(cov, bounds[:-1][filled], dtype=np.float64)
+    
+    means = np.full(counts.size, np.nan)
+    np.divide(sums, counts, out=means, where=filled)
+    return samples, means.reshape(len(samples), num_segments + 1)[:, :num_segments].T
+
+def _segment_leaders(segment_means, min_coverage):
+    """Index of the highest-coverage sample in each segment, or -1 where none reaches min_coverage"""
+    ranked = np.where(segment_means >= min_coverage, segment_means, -np.inf)
+    leaders = ranked.argmax(axis=1)
+    # One argmax pass; the winner's own value tells whether anything qualified
+    return np.where(ranked[np.arange(len(leaders)), leaders] > -np.inf, leaders, -1)
+
+def count_segment_leaders(contig_data, contig_length, num_segments, min_coverage):
+    """Return (unique leaders, segments with a leader) for one contig"""
+    _, segment_means = _compute_segment_means(contig_data, contig_length, num_segments)
+    leaders = _segment_leaders(segment_means, min_coverage)
+    leaders = leaders[leaders >= 0].tolist()
+    return len(set(leaders)), len(leaders)
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _segment_leaders_kernel(pos, cov, sample_offsets, contig_length, num_segments, min_coverage):
+        """Leader sample index (-1 if none) and its mean coverage for every segment of one contig.
+        
+        Sample s owns pos/cov[sample_offsets[s]:sample_offsets[s + 1]]. Each sample is
+        binned in one pass and immediately compared against the running best per segment.
+        """
+        best_idx = np.full(num_segments, -1, dtype=np.int32)
+        best_mean = np.full(num_segments, -1.0)
+        sums = np.zeros(num_segments)
+        counts = np.zeros(num_segments, dtype=np.int64)
+        for s in range(len(sample_offsets) - 1):
+            sums[:] = 0.0
+            counts[:] = 0
+            for i in range(sample_offsets[s], sample_offsets[s + 1]):
+                if pos[i] >= contig_length:  # positions are sorted, so the rest are past the end too
+                    break
+                # Last segment whose _segment_boundaries start is <= pos[i]
+                seg = (num_segments * (pos[i] + 1) - 1) // contig_length
+                sums[seg] += cov[i]
+                counts[seg] += 1
+            for seg in range(num_segments):
+                if counts[seg] > 0:
+                    mean = sums[seg] / counts[seg]
+                    if mean >= min_coverage and mean > best_mean[seg]:
+                        best_mean[seg] = mean
+                        best_idx[seg] = s
+        return best_idx, best_mean
+    
+    @njit(cache=True, parallel=True)
+    def _count_segment_leaders_kernel(pos, cov, sample_offsets, contig_sample_offsets, contig_lengths,
+                                      num_segments, min_coverage):
+        """Compiled count_segment_leaders over many contigs packed by _pack_contigs"""
+        num_contigs = len(contig_lengths)
+        unique_leaders = np.zeros(num_contigs, dtype=np.int64)
+        led_segments = np.zeros(num_contigs, dtype=np.int64)
+        for c in prange(num_contigs):
+            offsets = sample_offsets[contig_sample_offsets[c]:contig_sample_offsets[c + 1] + 1]
+            leaders, _ = _segment_leaders_kernel(pos, cov, offsets, contig_lengths[c], num_segments, min_coverage)
+            for seg in range(num_segments):
+                if leaders[seg] < 0:
+                    continue
+                led_segments[c] += 1
+                is_new = True
+                for prev in range(seg):
+                    if leaders[prev] == leaders[seg]:
+                        is_new = False
+                if is_new:
+                    unique_leaders[c] += 1
+        return unique_leaders, led_segments
+
+def _pack_contigs(contigs):
+    """Concatenate (contig_data, contig_length) pairs into flat arrays for the compiled kernels"""
+    arrays = [arr for contig_data, _ in contigs for arr in contig_data.values()]
+    sample_offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([arr.pos.size for arr in arrays], out=sample_offsets[1:])
+    contig_sample_offsets = np.zeros(len(contigs) + 1, dtype=np.int64)
+    np.cumsum([len(contig_data) for contig_data, _ in contigs], out=contig_sample_offsets[1:])
+    contig_lengths = np.array([contig_length for _, contig_length in contigs], dtype=np.int64)
+    return (np.concatenate([arr.pos for arr in arrays]), np.concatenate([arr.cov for arr in arrays]),
+            sample_offsets, contig_sample_offsets, contig_lengths)
+
+def contigs_to_screen(coverage_data, min_length=1000):
+    """Names and (contig_data, contig_length) pairs of the contigs long enough to screen"""
+    names = []
+    contigs = []
+    for contig_name, contig_data in coverage_data.items():
+        # Positions are sorted, so the contig ends at the last position of some sample
+        contig_length = max((int(arr.pos[-1]) for arr in contig_data.values() if arr.pos.size), default=0)
+        if contig_length >= min_length:
+            names.append(contig_name)
+            contigs.append((contig_data, contig_length))
+    return names, contigs
+
+def score_contigs(contigs, num_segments, min_coverage):
+    """count_segment_leaders for every (contig_data, contig_length) pair, compiled or in worker processes"""
+    if NUMBA_AVAILABLE and contigs:
+        unique_leaders, led_segments = _count_segment_leaders_kernel(*_pack_contigs(contigs), num_segments,
+                                                                     min_coverage)
+        return list(zip(unique_leaders.tolist(), led_segments.tolist()))
+    if not contigs:
+        return []
+    # Contigs are independent, so score them in parallel worker processes. Each task's arrays
+    # are pickled to its worker (a copy, even when they are memory-mapped from the cache)
+    contig_datas, contig_lengths = zip(*contigs)
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(count_segment_leaders, contig_datas, contig_lengths,
+                                 repeat(num_segments), repeat(min_coverage), chunksize=32))
 
 def analyze_coverage_distribution(contig_name, min_coverage=10):
     """Analyze coverage distribution along a specific contig to detect potential chimerism"""
     
     print(f"Analyzing coverage distribution for {contig_name}...")
-    config = load_config('config.yaml')
-    coverage_data = load_all_coverage_data(config['coverage_dir'])
+    config = cached_load_config('config.yaml')
+    coverage_data = cached_load_coverage_data(config['coverage_dir'])
     
     if contig_name not in coverage_data:
         print(f"Error: Contig '{contig_name}' not found!")
@@ -18,59 +167,55 @@ def analyze_coverage_distribution(contig_name, min_coverage=10):
     
     contig_data = coverage_data[contig_name]
     
-    # Get all positions across all samples
-    all_positions = set()
-    for sample in contig_data:
-        for point in contig_data[sample]:
-            all_positions.add(point['position'])
+    # Positions are sorted, so the contig ends at the last position of some sample
+    contig_length = max((int(arr.pos[-1]) for arr in contig_data.values() if arr.pos.size), default=0)
     
-    all_positions = sorted(all_positions)
-    contig_length = max(all_positions) if all_positions else 0
+    # Count distinct positions across all samples with a presence mask instead of sorting them
+    covered = np.zeros(contig_length + 1, dtype=bool)
+    for arr in contig_data.values():
+        covered[arr.pos] = True
+    num_positions = int(np.count_nonzero(covered))
     
     print(f"Contig length: {contig_length:,} bp")
-    print(f"Total coverage positions: {len(all_positions):,}")
+    print(f"Total coverage positions: {num_positions:,}")
     
     # Divide contig into segments for analysis
-    num_segments = min(10, len(all_positions) // 100)  # Max 10 segments, min 100 positions per segment
+    num_segments = min(10, num_positions // 100)  # Max 10 segments, min 100 positions per segment
     if num_segments < 3:
         num_segments = 3
     
     segment_size = contig_length // num_segments
+    boundaries = _segment_boundaries(contig_length, num_segments).tolist()
     
     print(f"\nAnalyzing {num_segments} segments of ~{segment_size:,} bp each:")
     print("="*80)
     
-    # Find top contributors for each segment
+    samples, segment_means = _compute_segment_means(contig_data, contig_length, num_segments)
+    
+    # Shorten sample names for display (last 3 underscore-separated parts)
+    short_names = {sample: '_'.join(sample.rsplit('_', 3)[-3:]) for sample in samples}
+    
+    # Rank the samples of every segment in one stable sort; means below the threshold (or NaN) sort last
+    ranked = np.where(segment_means >= min_coverage, segment_means, -np.inf)
+    top = np.argsort(-ranked, axis=1, kind='stable')[:, :5]
+    num_top = np.minimum(np.count_nonzero(ranked > -np.inf, axis=1), 5)
+    
+    # Report the top contributors for each segment; the first one is the segment leader
+    segment_leaders = []
+    unique_leaders = set()
     for seg_idx in range(num_segments):
-        seg_start = seg_idx * segment_size
-        seg_end = (seg_idx + 1) * segment_size if seg_idx < num_segments - 1 else contig_length
+        seg_start, seg_end = boundaries[seg_idx], boundaries[seg_idx + 1]
         
-        # Get coverage for each sample in this segment
-        segment_coverage = {}
-        for sample in contig_data:
-            total_cov = 0
-            positions_in_segment = 0
-            
-            for point in contig_data[sample]:
-                if seg_start <= point['position'] < seg_end:
-                    total_cov += point['coverage']
-                    positions_in_segment += 1
-            
-            if positions_in_segment > 0:
-                mean_cov = total_cov / positions_in_segment
-                if mean_cov >= min_coverage:
-                    segment_coverage[sample] = mean_cov
-        
-        # Sort by coverage
-        top_samples = sorted(segment_coverage.items(), key=lambda x: x[1], reverse=True)[:5]
+        seg_means = segment_means[seg_idx].tolist()
+        top_idx = top[seg_idx, :num_top[seg_idx]].tolist()
+        segment_leaders.append(samples[top_idx[0]] if top_idx else None)
+        if top_idx:
+            unique_leaders.add(segment_leaders[-1])
         
         print(f"Segment {seg_idx + 1}: {seg_start:,}-{seg_end:,} bp")
-        if top_samples:
-            for sample, cov in top_samples:
-                # Shorten sample name for display
-                short_name = sample.split('_')[-3:]  # Take last 3 parts
-                short_name = '_'.join(short_name)
-                print(f"  {short_name:<30} {cov:>8.1f}")
+        if top_idx:
+            for j in top_idx:
+                print(f"  {short_names[samples[j]]:<30} {seg_means[j]:>8.1f}")
         else:
             print("  (No samples with significant coverage)")
         print()
@@ -80,35 +225,6 @@ def analyze_coverage_distribution(contig_name, min_coverage=10):
     print("="*50)
     
     # Check if different samples dominate different segments
-    segment_leaders = []
-    for seg_idx in range(num_segments):
-        seg_start = seg_idx * segment_size
-        seg_end = (seg_idx + 1) * segment_size if seg_idx < num_segments - 1 else contig_length
-        
-        segment_coverage = {}
-        for sample in contig_data:
-            total_cov = 0
-            positions_in_segment = 0
-            
-            for point in contig_data[sample]:
-                if seg_start <= point['position'] < seg_end:
-                    total_cov += point['coverage']
-                    positions_in_segment += 1
-            
-            if positions_in_segment > 0:
-                mean_cov = total_cov / positions_in_segment
-                if mean_cov >= min_coverage:
-                    segment_coverage[sample] = mean_cov
-        
-        if segment_coverage:
-            leader = max(segment_coverage.items(), key=lambda x: x[1])
-            segment_leaders.append(leader[0])
-        else:
-            segment_leaders.append(None)
-    
-    # Count unique leaders
-    unique_leaders = set(leader for leader in segment_leaders if leader is not None)
-    
     print(f"Number of different 'dominant' samples across segments: {len(unique_leaders)}")
     
     if len(unique_leaders) <= 2:
@@ -123,62 +239,27 @@ def analyze_coverage_distribution(contig_name, min_coverage=10):
 def quick_chimera_scan():
     """Quick scan of all contigs to flag potential chimeras"""
     print("Quick chimera screening of all contigs...")
-    config = load_config('config.yaml')
-    coverage_data = load_all_coverage_data(config['coverage_dir'])
+    config = cached_load_config('config.yaml')
+    coverage_data = cached_load_coverage_data(config['coverage_dir'])
     
-    chimera_scores = []
+    # Divide each contig into 5 segments
+    num_segments = 5
+    min_segment_coverage = 5  # Lower threshold for screening
     
-    for contig_name in coverage_data:
-        contig_data = coverage_data[contig_name]
-        
-        # Get all positions
-        all_positions = set()
-        for sample in contig_data:
-            for point in contig_data[sample]:
-                all_positions.add(point['position'])
-        
-        all_positions = sorted(all_positions)
-        contig_length = max(all_positions) if all_positions else 0
-        
-        if contig_length < 1000:  # Skip very short contigs
-            continue
-        
-        # Divide into 5 segments
-        num_segments = 5
-        segment_size = contig_length // num_segments
-        
-        segment_leaders = []
-        for seg_idx in range(num_segments):
-            seg_start = seg_idx * segment_size
-            seg_end = (seg_idx + 1) * segment_size if seg_idx < num_segments - 1 else contig_length
-            
-            segment_coverage = {}
-            for sample in contig_data:
-                total_cov = 0
-                positions_in_segment = 0
-                
-                for point in contig_data[sample]:
-                    if seg_start <= point['position'] < seg_end:
-                        total_cov += point['coverage']
-                        positions_in_segment += 1
-                
-                if positions_in_segment > 0:
-                    mean_cov = total_cov / positions_in_segment
-                    if mean_cov >= 5:  # Lower threshold for screening
-                        segment_coverage[sample] = mean_cov
-            
-            if segment_coverage:
-                leader = max(segment_coverage.items(), key=lambda x: x[1])
-                segment_leaders.append(leader[0])
-        
+    # Skip very short contigs
+    screened_names, screened_contigs = contigs_to_screen(coverage_data)
+    
+    leader_counts = score_contigs(screened_contigs, num_segments, min_segment_coverage)
+    
+    chimera_scores = []
+    for contig_name, (unique_leaders, led_segments) in zip(screened_names, leader_counts):
         # Score based on number of different leaders
-        unique_leaders = len(set(leader for leader in segment_leaders if leader is not None))
-        if len(segment_leaders) > 0:
-            chimera_score = unique_leaders / len(segment_leaders)
-            chimera_scores.append((contig_name, chimera_score, unique_leaders, len(segment_leaders)))
+        if led_segments > 0:
+            chimera_score = unique_leaders / led_segments
+            chimera_scores.append((contig_name, chimera_score, int(unique_leaders), int(led_segments)))
     
     # Sort by chimera score (highest first)
-    chimera_scores.sort(key=lambda x: x[1], reverse=True)
+    chimera_scores.sort(key=itemgetter(1), reverse=True)
     
     print("\nCHIMERA SCREENING RESULTS:")
     print("="*60)
@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 
-from generate_interactive_html import load_all_coverage_data, load_config, generate_html, get_contigs_from_fasta
+from generate_interactive_html import cached_load_coverage_data, cached_load_config, generate_html, get_contigs_from_fasta
+import numpy as np
 
 def create_filtered_visualization(min_mean_coverage=1.0, max_samples=50):
     """Create visualization for all contigs with sample filtering"""
     
     print("Loading configuration...")
-    config = load_config('config.yaml')
+    config = cached_load_config('config.yaml')
     
     print("Loading all coverage data...")
-    all_coverage_data = load_all_coverage_data(config['coverage_dir'])
+    all_coverage_data = cached_load_coverage_data(config['coverage_dir'])
     
     print("Loading contig names...")
     all_contigs = get_contigs_from_fasta(config['fasta_path'])
@@ -26,22 +27,21 @@ def create_filtered_visualization(min_mean_coverage=1.0, max_samples=50):
             continue
         
         contig_data = all_coverage_data[contig]
-        total_samples_before += len(contig_data)
+        samples = list(contig_data)
+        total_samples_before += len(samples)
         
-        # Calculate mean coverage and filter
-        sample_stats = []
-        for sample, coverage_points in contig_data.items():
-            if coverage_points:
-                mean_cov = sum(point['coverage'] for point in coverage_points) / len(coverage_points)
-                if mean_cov >= min_mean_coverage:
-                    sample_stats.append((sample, mean_cov, coverage_points))
+        # Calculate mean coverage and filter (samples without points get NaN and never pass)
+        means = np.fromiter((arr.cov.mean(dtype=np.float64) if arr.cov.size else np.nan
+                             for arr in contig_data.values()),
+                            dtype=np.float64, count=len(samples))
+        passing = np.flatnonzero(means >= min_mean_coverage)
         
-        # Keep top N samples by coverage
-        sample_stats.sort(key=lambda x: x[1], reverse=True)
-        top_samples = sample_stats[:max_samples]
+        # Keep top N samples by coverage (stable, so tied samples keep their sample order)
+        order = passing[np.argsort(-means[passing], kind='stable')][:max_samples]
+        top_samples = [samples[j] for j in order]
         
         if top_samples:
-            filtered_coverage_data[contig] = {sample: coverage_points for sample, _, coverage_points in top_samples}
+            filtered_coverage_data[contig] = {sample: contig_data[sample] for sample in top_samples}
             total_samples_after += len(top_samples)
             print(f"  {contig}: {len(top_samples)} of {len(contig_data)} samples")
     
@@ -52,9 +52,7 @@ def create_filtered_visualization(min_mean_coverage=1.0, max_samples=50):
     print(f"  Data reduction: {(1 - total_samples_after/total_samples_before)*100:.1f}%")
     
     # Count unique samples
-    unique_samples = set()
-    for contig_data in filtered_coverage_data.values():
-        unique_samples.update(contig_data.keys())
+    unique_samples = set().union(*filtered_coverage_data.values())
     
     print(f"  Unique samples in final dataset: {len(unique_samples)}")
     
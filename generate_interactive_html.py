@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
 import os
-import glob
 import gzip
+import io
 import json
+import mmap
+import re
 import sys
 import argparse
-from collections import defaultdict
+import base64
+import functools
+from array import array
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
 
 try:
     import yaml
@@ -14,51 +22,393 @@ try:
 except ImportError:
     YAML_AVAILABLE = False
 
+# ISA-L's SIMD inflate decompresses .bed.gz files several times faster than zlib
+try:
+    from isal import igzip as gzip_reader
+except ImportError:
+    gzip_reader = gzip
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Per-sample coverage in structure-of-arrays form: sorted positions and their coverage
+SampleCoverage = namedtuple('SampleCoverage', ['pos', 'cov'])
+
+# Directory (inside the coverage directory) holding the parsed-array cache
+COVERAGE_CACHE_DIR = ".coverage_cache"
+
+# Upper bound on the number of columns in the heat map
+HEATMAP_BINS = 1000
+
+# Distinct colours a covered heat map cell can take (level 0 is reserved for no coverage)
+COLOR_LEVELS = 255
+
+# Read-ahead for decompressed coverage streams (the default 8 KiB means many tiny reads)
+READ_BUFFER_SIZE = 1 << 20
+
+# Decompressed bytes handed to the compiled BED parser at a time
+PARSE_CHUNK_SIZE = 64 << 20
+
+# First word of each FASTA header line
+FASTA_HEADER_RE = re.compile(rb'^>[^\S\n]*(\S+)', re.MULTILINE)
+
 def get_contigs_from_fasta(fasta_path):
     """Extract contig names from FASTA file"""
-    contigs = []
-    with open(fasta_path, 'r') as f:
+    with open(fasta_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # mmap cannot map an empty file
+            return []
+        # Scan the mapped file for header lines in C instead of reading every sequence line
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return [m.group(1).decode() for m in FASTA_HEADER_RE.finditer(data)]  # Get just the contig name
+
+def _coverage_files(coverage_dir):
+    """Yield the path of every *.per-base.bed.gz file in coverage_dir, in directory order"""
+    try:
+        entries = os.scandir(coverage_dir)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.endswith(".per-base.bed.gz") and not entry.name.startswith('.') and entry.is_file():
+                yield entry.path
+
+def _sorted_coverage(positions, coverages):
+    """Build a position-sorted SampleCoverage from typed position/coverage buffers or arrays"""
+    pos = np.asarray(positions, dtype=np.int32)
+    cov = np.asarray(coverages, dtype=np.float32)
+    if np.all(pos[1:] >= pos[:-1]):  # per-base BED files are normally already in order
+        return SampleCoverage(pos, cov)
+    order = np.argsort(pos, kind='stable')
+    return SampleCoverage(pos[order], cov[order])
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _parse_bed_kernel(buf, max_runs):
+        """Parse complete BED lines from a uint8 buffer into positions, coverage and contig runs.
+        
+        Returns (pos, cov, run_first, run_name_start, run_name_end, num_runs, ok). Run r is
+        a stretch of consecutive records for one contig, starting at record run_first[r],
+        whose name is buf[run_name_start[r]:run_name_end[r]]. Only the first max_runs runs
+        are stored; if num_runs is larger the caller must parse again with more room.
+        ok is False when a field is not a plain decimal number, in which case the caller
+        should use the Python parser instead.
+        """
+        n = len(buf)
+        max_records = 1
+        for i in range(n):
+            if buf[i] == 10:
+                max_records += 1
+        pos = np.empty(max_records, dtype=np.int32)
+        cov = np.empty(max_records, dtype=np.float32)
+        # One entry per contig run rather than per record
+        run_first = np.empty(max_runs, dtype=np.int64)
+        run_name_start = np.empty(max_runs, dtype=np.int64)
+        run_name_end = np.empty(max_runs, dtype=np.int64)
+        num_records = 0
+        num_runs = 0
+        run_start = 0
+        run_end = 0
+        
+        i = 0
+        while i < n:
+            # Column 1: contig name
+            name_start = i
+            while i < n and buf[i] != 9 and buf[i] != 10:
+                i += 1
+            name_end = i
+            if i >= n or buf[i] == 10:  # fewer than 4 columns
+                i += 1
+                continue
+            i += 1
+            
+            # Column 2: start position
+            start = 0
+            digits = 0
+            while i < n and 48 <= buf[i] <= 57:
+                start = start * 10 + (buf[i] - 48)
+                digits += 1
+                i += 1
+            if digits == 0 or digits > 10 or start > 2147483647 or i >= n or buf[i] != 9:
+                return pos[:0], cov[:0], run_first[:0], run_name_start[:0], run_name_end[:0], 0, False
+            i += 1
+            
+            # Column 3: end position (unused)
+            while i < n and buf[i] != 9 and buf[i] != 10:
+                i += 1
+            if i >= n or buf[i] == 10:  # fewer than 4 columns
+                i += 1
+                continue
+            i += 1
+            
+            # Column 4: coverage as digits[.digits]; dividing the exact integer mantissa by an
+            # exact power of ten rounds the same way as float()
+            mantissa = 0
+            digits = 0
+            scale = 0
+            seen_point = False
+            while i < n:
+                c = buf[i]
+                if 48 <= c <= 57:
+                    mantissa = mantissa * 10 + (c - 48)
+                    digits += 1
+                    if seen_point:
+                        scale += 1
+                elif c == 46 and not seen_point:
+                    seen_point = True
+                else:
+                    break
+                i += 1
+            if digits == 0 or digits > 15 or (i < n and buf[i] != 9 and buf[i] != 10 and buf[i] != 13):
+                return pos[:0], cov[:0], run_first[:0], run_name_start[:0], run_name_end[:0], 0, False
+            while i < n and buf[i] != 10:
+                i += 1
+            i += 1
+            
+            # Start a new run when the contig name differs from the previous record's
+            same_contig = False
+            if num_runs > 0 and run_end - run_start == name_end - name_start:
+                same_contig = True
+                for k in range(name_end - name_start):
+                    if buf[run_start + k] != buf[name_start + k]:
+                        same_contig = False
+                        break
+            if not same_contig:
+                run_start = name_start
+                run_end = name_end
+                if num_runs < max_runs:
+                    run_first[num_runs] = num_records
+                    run_name_start[num_runs] = name_start
+                    run_name_end[num_runs] = name_end
+                num_runs += 1
+            
+            divisor = 1.0
+            for _ in range(scale):
+                divisor *= 10.0
+            pos[num_records] = start
+            cov[num_records] = mantissa / divisor
+            num_records += 1
+        
+        stored = min(num_runs, max_runs)
+        return (pos[:num_records], cov[:num_records], run_first[:stored],
+                run_name_start[:stored], run_name_end[:stored], num_runs, True)
+
+def _parse_bed_file_numba(file_path):
+    """Parse one BED file into {contig: SampleCoverage} with the compiled kernel, or None if it can't"""
+    columns = {}
+    max_runs = 1024
+    with io.BufferedReader(gzip_reader.open(file_path, 'rb'), buffer_size=READ_BUFFER_SIZE) as f:
+        remainder = b''
+        while True:
+            chunk = f.read(PARSE_CHUNK_SIZE)
+            data = remainder + chunk
+            # Parse whole lines only; a partial last line waits for the next chunk
+            cut = len(data) if not chunk else data.rfind(b'\n') + 1
+            remainder = data[cut:]
+            buf = np.frombuffer(data, dtype=np.uint8, count=cut)
+            pos, cov, run_first, name_start, name_end, num_runs, ok = _parse_bed_kernel(buf, max_runs)
+            if not ok:
+                return None
+            if num_runs > max_runs:
+                # More contig runs than expected; keep the larger size for the rest of the file
+                max_runs = num_runs
+                pos, cov, run_first, name_start, name_end, num_runs, ok = _parse_bed_kernel(buf, max_runs)
+            run_last = np.append(run_first[1:], len(pos))
+            for first, last, lo, hi in zip(run_first.tolist(), run_last.tolist(), name_start.tolist(), name_end.tolist()):
+                column = columns.setdefault(data[lo:hi], ([], []))
+                column[0].append(pos[first:last])
+                column[1].append(cov[first:last])
+            if not chunk:
+                break
+    
+    return {contig.decode(): _sorted_coverage(np.concatenate(positions), np.concatenate(coverages))
+            for contig, (positions, coverages) in columns.items()}
+
+def _parse_bed_file(file_path):
+    """Parse one BED file into {contig: SampleCoverage}, with the Numba kernel when available"""
+    if NUMBA_AVAILABLE:
+        parsed = _parse_bed_file_numba(file_path)
+        if parsed is not None:
+            return parsed
+    
+    # Parse raw bytes: int()/float() accept bytes and ignore the trailing newline,
+    # so lines are never decoded or stripped. Values go into typed arrays keyed by
+    # the undecoded contig name.
+    columns = {}
+    contig = None
+    with io.BufferedReader(gzip_reader.open(file_path, 'rb'), buffer_size=READ_BUFFER_SIZE) as f:
         for line in f:
-            if line.startswith('>'):
-                contig_name = line[1:].split()[0]  # Get just the contig name
-                contigs.append(contig_name)
-    return contigs
+            parts = line.split(b'\t', 4)
+            if len(parts) >= 4:
+                # Records come grouped by contig, so the dict lookup and the bound
+                # append methods only change when the contig does
+                if parts[0] != contig:
+                    contig = parts[0]
+                    column = columns.get(contig)
+                    if column is None:
+                        column = columns[contig] = (array('i'), array('f'))
+                    append_position, append_coverage = column[0].append, column[1].append
+                append_position(int(parts[1]))
+                append_coverage(float(parts[3]))
+    
+    return {contig.decode(): _sorted_coverage(positions, coverages)
+            for contig, (positions, coverages) in columns.items()}
+
+def _parse_cache_path(file_path):
+    """Location of the saved parse of one BED file"""
+    return os.path.join(os.path.dirname(file_path), COVERAGE_CACHE_DIR, os.path.basename(file_path) + ".parsed.npz")
+
+def _read_parse_cache(file_path, *keys):
+    """Load the named arrays of a BED file's saved parse, or return None if it is missing or stale"""
+    try:
+        with np.load(_parse_cache_path(file_path)) as cached:
+            if tuple(cached['signature'].tolist()) != _file_signature(file_path):
+                return None
+            return {key: cached[key] for key in keys}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _coverage_stats(parsed):
+    """Return (contigs, mean coverage, max coverage) for one file's {contig: SampleCoverage}"""
+    means = np.array([arr.cov.mean(dtype=np.float64) if arr.cov.size else np.nan for arr in parsed.values()])
+    maxes = np.array([arr.cov.max(initial=0) for arr in parsed.values()], dtype=np.float64)
+    return list(parsed), means, maxes
+
+def _parse_bed_file_cached(file_path):
+    """Parse one BED file, reusing its saved arrays from COVERAGE_CACHE_DIR while the file is unchanged"""
+    cached = _read_parse_cache(file_path, 'contigs', 'offsets', 'pos', 'cov')
+    if cached is not None:
+        offsets, pos, cov = cached['offsets'], cached['pos'], cached['cov']
+        return {contig: SampleCoverage(pos[lo:hi], cov[lo:hi])
+                for contig, lo, hi in zip(cached['contigs'].tolist(), offsets[:-1], offsets[1:])}
+    
+    parsed = _parse_bed_file(file_path)
+    # Per-contig summary stats are computed while the arrays are hot and saved alongside them
+    contigs, means, maxes = _coverage_stats(parsed)
+    offsets = np.zeros(len(parsed) + 1, dtype=np.int64)
+    np.cumsum([arr.pos.size for arr in parsed.values()], out=offsets[1:])
+    cache_path = _parse_cache_path(file_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            # Compressed, since the directory cache may hold an uncompressed copy of the same data
+            np.savez_compressed(f, signature=np.array(_file_signature(file_path), dtype=np.int64), offsets=offsets,
+                     contigs=np.array(contigs, dtype=str), mean=means, max=maxes,
+                     pos=np.concatenate([arr.pos for arr in parsed.values()] or [np.empty(0, np.int32)]),
+                     cov=np.concatenate([arr.cov for arr in parsed.values()] or [np.empty(0, np.float32)]))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write parse cache {cache_path}: {e}")
+    return parsed
+
+def _bed_file_stats(file_path):
+    """Return (contigs, mean coverage, max coverage) for one BED file, from its saved parse when fresh"""
+    cached = _read_parse_cache(file_path, 'contigs', 'mean', 'max')
+    if cached is None:
+        return _coverage_stats(_parse_bed_file_cached(file_path))
+    return cached['contigs'].tolist(), cached['mean'], cached['max']
 
 def _load_raw_coverage_data(coverage_dir):
-    """Load raw coverage data from BED files without filtering"""
-    files = glob.glob(os.path.join(coverage_dir, "*.per-base.bed.gz"))
-    coverage_data = defaultdict(lambda: defaultdict(list))
+    """Load raw coverage data from BED files as {contig: {sample: SampleCoverage}} without filtering"""
+    files = list(_coverage_files(coverage_dir))
+    coverage_data = {}
     
     print(f"Processing {len(files)} coverage files...")
     
-    for i, file_path in enumerate(files):
-        # Extract sample name from filename (use full filename minus extensions)
-        sample_name = os.path.basename(file_path).split(".per-base.bed.gz")[0]
-        
-        print(f"Processing {sample_name}... ({i+1}/{len(files)})")
-        
-        with gzip.open(file_path, 'rt') as f:
-            for line in f:
-                parts = line.strip().split('\t')
-                if len(parts) >= 4:
-                    contig, start, end, coverage = parts[:4]
-                    start = int(start)
-                    coverage = float(coverage)
-                    
-                    coverage_data[contig][sample_name].append({
-                        'position': start,
-                        'coverage': coverage
-                    })
-    
-    # Sort all coverage data by position
-    for contig in coverage_data:
-        for sample in coverage_data[contig]:
-            coverage_data[contig][sample].sort(key=lambda x: x['position'])
+    # Files are independent, so parse them in parallel worker processes
+    with ProcessPoolExecutor() as executor:
+        for i, (file_path, file_data) in enumerate(zip(files, executor.map(_parse_bed_file_cached, files))):
+            # Extract sample name from filename (use full filename minus extensions)
+            sample_name = os.path.basename(file_path).split(".per-base.bed.gz")[0]
+            
+            print(f"Processing {sample_name}... ({i+1}/{len(files)})")
+            for contig, arr in file_data.items():
+                coverage_data.setdefault(contig, {})[sample_name] = arr
+    
+    return coverage_data
+
+def load_coverage_stats(coverage_dir):
+    """Load mean and max coverage of every (contig, sample) pair as a flat table.
+    
+    Returns {'contig': [...], 'sample': [...], 'mean': ndarray, 'max': ndarray} with one
+    row per pair, ordered by file and then by contig within the file. The stats are
+    saved with each file's parse, so later runs don't need the coverage arrays at all.
+    """
+    files = list(_coverage_files(coverage_dir))
+    table = {'contig': [], 'sample': [], 'mean': [], 'max': []}
+    
+    print(f"Processing {len(files)} coverage files...")
+    
+    with ProcessPoolExecutor() as executor:
+        for i, (file_path, (contigs, means, maxes)) in enumerate(zip(files, executor.map(_bed_file_stats, files))):
+            sample_name = os.path.basename(file_path).split(".per-base.bed.gz")[0]
+            print(f"Processing {sample_name}... ({i+1}/{len(files)})")
+            table['contig'].extend(contigs)
+            table['sample'].extend([sample_name] * len(contigs))
+            table['mean'].append(means)
+            table['max'].append(maxes)
     
-    return dict(coverage_data)
+    table['mean'] = np.concatenate(table['mean'] or [np.empty(0)])
+    table['max'] = np.concatenate(table['max'] or [np.empty(0)])
+    return table
+
+def _read_bed_arrow(file_path):
+    """Parse one BED file into {contig: SampleCoverage} with PyArrow's C++ CSV reader"""
+    table = pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(column_names=['contig', 'start', 'end', 'coverage']),
+        parse_options=pa_csv.ParseOptions(delimiter='\t'),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={'contig': pa.string(), 'start': pa.int32(), 'coverage': pa.float32()},
+            include_columns=['contig', 'start', 'coverage']))
+    contigs = table.column('contig').combine_chunks().dictionary_encode()
+    contig_idx = contigs.indices.to_numpy()
+    pos = table.column('start').to_numpy()
+    cov = table.column('coverage').to_numpy()
+    
+    # Group rows by contig (in order of first appearance), then sort by position
+    order = np.lexsort((pos, contig_idx))
+    contig_idx, pos, cov = contig_idx[order], pos[order], cov[order]
+    bounds = np.searchsorted(contig_idx, np.arange(len(contigs.dictionary) + 1))
+    return {contig: SampleCoverage(pos[lo:hi], cov[lo:hi])
+            for contig, lo, hi in zip(contigs.dictionary.to_pylist(), bounds[:-1], bounds[1:])}
+
+def _load_coverage_arrays_arrow(coverage_dir):
+    """Load raw coverage straight into SampleCoverage arrays using PyArrow"""
+    files = list(_coverage_files(coverage_dir))
+    coverage_data = {}
+    
+    print(f"Processing {len(files)} coverage files...")
+    
+    # Arrow and NumPy release the GIL while parsing and sorting, so threads overlap whole
+    # files without pickling the arrays back from worker processes
+    with ThreadPoolExecutor() as executor:
+        for i, (file_path, file_data) in enumerate(zip(files, executor.map(_read_bed_arrow, files))):
+            sample_name = os.path.basename(file_path).split(".per-base.bed.gz")[0]
+            print(f"Processing {sample_name}... ({i+1}/{len(files)})")
+            for contig, arr in file_data.items():
+                coverage_data.setdefault(contig, {})[sample_name] = arr
+    
+    return coverage_data
 
 def load_all_coverage_data(coverage_dir, min_mean_coverage=None, min_max_coverage=None):
-    """Load all coverage data from BED files and optionally filter samples by coverage thresholds"""
+    """Load all coverage data from BED files as SampleCoverage arrays and optionally filter samples by coverage thresholds"""
     # Load raw data first
     coverage_data = _load_raw_coverage_data(coverage_dir)
     
@@ -77,19 +427,18 @@ def load_all_coverage_data(coverage_dir, min_mean_coverage=None, min_max_coverag
     total_samples_after = 0
     
     for contig in coverage_data:
-        for sample in coverage_data[contig]:
+        for sample, arr in coverage_data[contig].items():
             total_samples_before += 1
-            coverages = [d['coverage'] for d in coverage_data[contig][sample]]
             
-            if not coverages:  # Skip empty coverage data
+            if not arr.cov.size:  # Skip empty coverage data
                 continue
                 
-            mean_coverage = sum(coverages) / len(coverages)
-            max_coverage = max(coverages)
+            mean_coverage = arr.cov.mean(dtype=np.float64)
+            max_coverage = arr.cov.max()
             
             # Apply filtering thresholds
             if mean_coverage >= min_mean_coverage and max_coverage >= min_max_coverage:
-                filtered_data[contig][sample] = coverage_data[contig][sample]
+                filtered_data[contig][sample] = arr
                 total_samples_after += 1
     
     print(f"Filtered {total_samples_before} sample-contig pairs to {total_samples_after} pairs")
@@ -97,16 +446,92 @@ def load_all_coverage_data(coverage_dir, min_mean_coverage=None, min_max_coverag
     
     return dict(filtered_data)
 
+def _json_default(obj):
+    """Serialize NumPy arrays and scalars that the JSON encoder can't handle natively"""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(obj):
+    """Serialize to compact UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_json_default, separators=(',', ':')).encode()
+
+def _heatmap_summary(contig_data, max_bins=HEATMAP_BINS):
+    """Pre-bin one contig into a (sample, bin) matrix for the heat map and summarise every sample's coverage.
+    
+    The contig (0 to its last covered position) is cut into at most max_bins bins of
+    binSize bp. A sample's value in a bin is the mean of its records starting there;
+    bins with no record take the coverage of the record covering them (per-base BED
+    files merge runs of equal depth), and bins before a sample's first record are 0.
+    Bin means are shipped as uint8 colour levels: 0 for no coverage, otherwise
+    1..COLOR_LEVELS spread evenly over the log10(coverage + 0.1) colour domain.
+    """
+    contig_length = max(int(arr.pos[-1]) for arr in contig_data.values() if arr.pos.size)
+    bin_size = max(1, -(-(contig_length + 1) // max_bins))
+    num_bins = contig_length // bin_size + 1
+    
+    samples = sorted(contig_data)
+    matrix = np.zeros((len(samples), num_bins), dtype=np.float32)
+    stats = {'mean': [], 'median': [], 'max': []}
+    min_positive = None
+    for row, sample in enumerate(samples):
+        arr = contig_data[sample]
+        cov = arr.cov.astype(np.float64)
+        bin_idx = arr.pos // bin_size
+        sums = np.bincount(bin_idx, weights=cov, minlength=num_bins)
+        counts = np.bincount(bin_idx, minlength=num_bins)
+        binned = matrix[row]
+        np.divide(sums, counts, out=binned, where=counts > 0, casting='unsafe')
+        # Forward-fill empty bins from the last record that starts before them
+        empty = np.flatnonzero(counts == 0)
+        covering = np.searchsorted(arr.pos, empty * bin_size, side='right') - 1
+        binned[empty] = np.where(covering >= 0, cov[np.maximum(covering, 0)], 0)
+        positive = cov[cov > 0]
+        if positive.size:
+            min_positive = min(min_positive or np.inf, float(positive.min()))
+        stats['mean'].append(float(cov.mean()))
+        stats['median'].append(float(np.partition(cov, len(cov) // 2)[len(cov) // 2]))
+        stats['max'].append(float(cov.max()))
+    
+    # Colour domain of the heat map, log10(minCoverage) .. log10(maxCoverage + 1)
+    min_coverage = max(0.1, min_positive) if min_positive is not None else 0.1
+    max_coverage = max(stats['max'])
+    log_min, log_max = np.log10(min_coverage), np.log10(max_coverage + 1)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = (np.log10(matrix.astype(np.float64) + 0.1) - log_min) / (log_max - log_min)
+    scaled = np.clip(np.nan_to_num(scaled), 0, 1)
+    levels = np.where(matrix > 0, 1 + np.rint(scaled * (COLOR_LEVELS - 1)), 0).astype(np.uint8)
+    
+    return {
+        'length': contig_length,
+        'binSize': bin_size,
+        'numBins': num_bins,
+        'minCoverage': min_coverage,
+        'maxCoverage': max_coverage,
+        'samples': samples,
+        **stats,
+        # Row-major (sample, bin) matrix of colour levels, base64-encoded
+        'levels': base64.b64encode(levels.tobytes()).decode('ascii'),
+    }
+
 def generate_html(contigs, coverage_data, output_path, title="Interactive Contig Coverage Viewer", dataset_name="Contig Coverage Analysis"):
     """Generate interactive HTML with embedded data"""
     
     # Convert data to JSON strings
     contigs_json = json.dumps(contigs)
-    coverage_json = json.dumps(coverage_data)
+    coverage_json = _dumps({contig: _heatmap_summary(contig_data) for contig, contig_data in coverage_data.items()})
+    # Numeric JSON compresses well; the page inflates it with DecompressionStream on load
+    coverage_gzip = gzip.compress(coverage_json, compresslevel=6, mtime=0)
+    del coverage_json
     num_contigs = len(contigs)
     num_samples = len(set(sample for contig_data in coverage_data.values() for sample in contig_data.keys()))
     
-    html_content = f"""<!DOCTYPE html>
+    # The page is written in two parts around the base64 coverage blob, which is
+    # encoded straight into the file instead of being copied into one big string
+    html_head = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -211,19 +636,30 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
     <script>
         // Embedded data
         const contigs = {contigs_json};
-        const coverageData = {coverage_json};
+        const coverageBlob = \""""
+    html_tail = f"""";
+        let coverageData = {{}};
         
         const colors = d3.scaleOrdinal(d3.schemeSet3);
         const margin = {{top: 20, right: 100, bottom: 60, left: 80}};
         const width = 1200 - margin.left - margin.right;
         const height = 450 - margin.top - margin.bottom;
+        const COLOR_LEVELS = {COLOR_LEVELS};
 
         // Initialize when DOM is ready
-        document.addEventListener('DOMContentLoaded', function() {{
+        document.addEventListener('DOMContentLoaded', async function() {{
+            coverageData = await decodeCoverageData(coverageBlob);
             populateContigSelect();
             document.getElementById('contigSelect').addEventListener('change', updateChart);
         }});
 
+        async function decodeCoverageData(blob) {{
+            // Coverage JSON is embedded gzip-compressed and base64-encoded
+            const bytes = Uint8Array.from(atob(blob), c => c.charCodeAt(0));
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return JSON.parse(await new Response(stream).text());
+        }}
+
         function populateContigSelect() {{
             console.log('Populating contig dropdown with', contigs.length, 'contigs');
             const select = document.getElementById('contigSelect');
@@ -271,17 +707,6 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
             return smoothed;
         }}
 
-        function calculateStats(data) {{
-            const values = data.map(d => d.coverage);
-            const sum = values.reduce((a, b) => a + b, 0);
-            const mean = sum / values.length;
-            const sorted = [...values].sort((a, b) => a - b);
-            const median = sorted[Math.floor(sorted.length / 2)];
-            const max = Math.max(...values);
-            
-            return {{ mean, median, max, length: values.length }};
-        }}
-
         function updateChart() {{
             const selectedContig = document.getElementById('contigSelect').value;
             
@@ -293,13 +718,15 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
                 return;
             }}
             
+            // Coverage is embedded pre-binned, with per-sample summary statistics
             const contigData = coverageData[selectedContig];
-            const samples = Object.keys(contigData).sort();
+            const samples = contigData.samples;
+            if (!contigData.decodedLevels) {{
+                contigData.decodedLevels = Uint8Array.from(atob(contigData.levels), c => c.charCodeAt(0));
+            }}
             
             // Show contig info
-            const maxPosition = Math.max(...samples.map(sample => 
-                Math.max(...contigData[sample].map(d => d.position))
-            ));
+            const maxPosition = contigData.length;
             document.getElementById('contigInfo').innerHTML = 
                 `<strong>Contig:</strong> ${{selectedContig}} | <strong>Length:</strong> ${{maxPosition.toLocaleString()}} bp | <strong>Samples:</strong> ${{samples.length}}`;
             document.getElementById('contigInfo').style.display = 'block';
@@ -307,12 +734,11 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
             // Calculate and show stats
             const statsDiv = document.getElementById('stats');
             statsDiv.innerHTML = '';
-            samples.forEach(sample => {{
-                const stats = calculateStats(contigData[sample]);
+            samples.forEach((sample, s) => {{
                 const statItem = document.createElement('div');
                 statItem.className = 'stat-item';
                 statItem.innerHTML = `<strong>${{sample}}</strong><br>
-                    Mean: ${{stats.mean.toFixed(2)}} | Median: ${{stats.median.toFixed(2)}} | Max: ${{stats.max.toFixed(2)}}`;
+                    Mean: ${{contigData.mean[s].toFixed(2)}} | Median: ${{contigData.median[s].toFixed(2)}} | Max: ${{contigData.max[s].toFixed(2)}}`;
                 statsDiv.appendChild(statItem);
             }});
             statsDiv.style.display = 'grid';
@@ -324,46 +750,32 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
             drawHeatMap(selectedContig, contigData, samples);
         }}
         
-        function getAllPositions(processedSamples) {{
-            const allPositions = new Set();
-            Object.values(processedSamples).forEach(data => {{
-                data.forEach(d => allPositions.add(d.position));
-            }});
-            return Array.from(allPositions).sort((a, b) => a - b);
+        function packColor(color) {{
+            // RGBA bytes of a CSS colour as one little-endian word for canvas ImageData
+            const c = d3.rgb(color);
+            return ((255 << 24) | (c.b << 16) | (c.g << 8) | c.r) >>> 0;
         }}
         
-        function getCoverageAtPosition(sampleData, position) {{
-            const point = sampleData.find(d => d.position === position);
-            return point ? point.coverage : 0;
+        function getCoverageAtPosition(contigData, sampleIndex, position) {{
+            // Bins are a fixed number of bp wide, so a position's bin is found by division
+            const i = Math.floor(position / contigData.binSize);
+            const level = i >= 0 && i < contigData.numBins ? contigData.decodedLevels[sampleIndex * contigData.numBins + i] : 0;
+            if (level === 0) return 0;
+            // Undo the log-scale quantization (accurate to one colour level)
+            const logMin = Math.log10(contigData.minCoverage);
+            const logMax = Math.log10(contigData.maxCoverage + 1);
+            return Math.pow(10, logMin + (level - 1) / (COLOR_LEVELS - 1) * (logMax - logMin)) - 0.1;
         }}
         
         function drawHeatMap(selectedContig, contigData, samples) {{
-            const processedSamples = {{}};
-            samples.forEach(sample => {{
-                processedSamples[sample] = contigData[sample];  // Use raw data without smoothing
-            }});
-            
-            const allPositions = getAllPositions(processedSamples);
-            const binSize = Math.max(1, Math.floor(allPositions.length / 1000)); // Limit to ~1000 bins for performance
-            
-            // Create binned data
-            const binnedPositions = [];
-            for (let i = 0; i < allPositions.length; i += binSize) {{
-                const binStart = allPositions[i];
-                const binEnd = allPositions[Math.min(i + binSize - 1, allPositions.length - 1)];
-                const binCenter = (binStart + binEnd) / 2;
-                binnedPositions.push({{ start: binStart, end: binEnd, center: binCenter }});
-            }}
-            
-            // Calculate max coverage for color scaling
-            const maxCoverage = Math.max(...samples.map(sample => 
-                Math.max(...processedSamples[sample].map(d => d.coverage))
-            ));
+            const contigLength = contigData.length;
+            const binSize = contigData.binSize;
+            const numBins = contigData.numBins;
+            const levels = contigData.decodedLevels;
             
             // Use log scale for better coverage visualization
-            const minCoverage = Math.max(0.1, d3.min(samples.map(sample => 
-                d3.min(processedSamples[sample].filter(d => d.coverage > 0).map(d => d.coverage))
-            )));
+            const maxCoverage = contigData.maxCoverage;
+            const minCoverage = contigData.minCoverage;
             
             const colorScale = d3.scaleSequential(d3.interpolateBlues)
                 .domain([Math.log10(minCoverage), Math.log10(maxCoverage + 1)]);
@@ -379,7 +791,7 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
                 .attr('transform', `translate(${{margin.left}},70)`);
             
             const xScale = d3.scaleLinear()
-                .domain(d3.extent(allPositions))
+                .domain([0, contigLength])
                 .range([0, width]);
             
             const yScale = d3.scaleBand()
@@ -387,25 +799,47 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
                 .range([0, samples.length * 30])
                 .padding(0.1);
             
-            // Draw heatmap rectangles
-            samples.forEach(sample => {{
-                binnedPositions.forEach(bin => {{
-                    // Calculate average coverage for this bin
-                    const relevantPoints = processedSamples[sample].filter(d => 
-                        d.position >= bin.start && d.position <= bin.end
-                    );
-                    const avgCoverage = relevantPoints.length > 0 ? 
-                        relevantPoints.reduce((sum, d) => sum + d.coverage, 0) / relevantPoints.length : 0;
-                    
-                    g.append('rect')
-                        .attr('x', xScale(bin.start))
-                        .attr('y', yScale(sample))
-                        .attr('width', Math.max(1, xScale(bin.end) - xScale(bin.start)))
-                        .attr('height', yScale.bandwidth())
-                        .attr('fill', avgCoverage > 0 ? colorScale(Math.log10(avgCoverage + 0.1)) : '#f0f0f0')
-                        .attr('stroke', 'none');
-                }});
+            // Paint the heat map into a canvas one pixel at a time and embed it as an image
+            const plotHeight = samples.length * 30;
+            const canvas = document.createElement('canvas');
+            canvas.width = width;
+            canvas.height = plotHeight;
+            const ctx = canvas.getContext('2d');
+            const image = ctx.createImageData(width, plotHeight);
+            const pixels = new Uint32Array(image.data.buffer);  // one little-endian RGBA word per pixel
+            
+            // Bin shown in each pixel column
+            const columnBins = new Int32Array(width);
+            for (let x = 0; x < width; x++) {{
+                columnBins[x] = Math.min(numBins - 1, Math.floor(xScale.invert(x + 0.5) / binSize));
+            }}
+            
+            // Colour of each level: 0 is no coverage, the rest spread evenly over the log colour domain
+            const logMin = Math.log10(minCoverage);
+            const logMax = Math.log10(maxCoverage + 1);
+            const colorLut = new Uint32Array(COLOR_LEVELS + 1);
+            colorLut[0] = packColor('#f0f0f0');
+            for (let level = 1; level <= COLOR_LEVELS; level++) {{
+                colorLut[level] = packColor(colorScale(logMin + (level - 1) / (COLOR_LEVELS - 1) * (logMax - logMin)));
+            }}
+            
+            samples.forEach((sample, s) => {{
+                const row = s * numBins;
+                const top = Math.round(yScale(sample));
+                const bottom = Math.round(yScale(sample) + yScale.bandwidth());
+                for (let y = top; y < bottom; y++) {{
+                    for (let x = 0; x < width; x++) {{
+                        pixels[y * width + x] = colorLut[levels[row + columnBins[x]]];
+                    }}
+                }}
             }});
+            ctx.putImageData(image, 0, 0);
+            
+            g.append('image')
+                .attr('width', width)
+                .attr('height', plotHeight)
+                .attr('preserveAspectRatio', 'none')
+                .attr('href', canvas.toDataURL());
             
             // Add axes
             g.append('g')
@@ -479,8 +913,13 @@ def generate_html(contigs, coverage_data, output_path, title="Interactive Contig
 </body>
 </html>"""
     
-    with open(output_path, 'w') as f:
-        f.write(html_content)
+    with open(output_path, 'w', buffering=1 << 20) as f:
+        f.write(html_head)
+        # Chunks are a multiple of 3 bytes, so their base64 encodings concatenate cleanly
+        chunk_size = 3 << 18
+        for start in range(0, len(coverage_gzip), chunk_size):
+            f.write(base64.b64encode(coverage_gzip[start:start + chunk_size]).decode('ascii'))
+        f.write(html_tail)
 
 def load_config(config_path="config.yaml"):
     """Load configuration from YAML file or return defaults"""
@@ -511,6 +950,142 @@ def load_config(config_path="config.yaml"):
         print(f"No config file found at {config_path}, using default configuration")
         return default_config
 
+def _file_signature(path):
+    """Return an (mtime, size) tuple for a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _coverage_dir_signature(coverage_dir):
+    """Return (name, mtime, size) for every coverage file so any change invalidates the cache"""
+    files = sorted(_coverage_files(coverage_dir))
+    return tuple((os.path.basename(path),) + _file_signature(path) for path in files)
+
+def _read_coverage_cache(cache_dir, signature):
+    """Memory-map cached coverage arrays, or return None if the cache is missing or stale"""
+    try:
+        with open(os.path.join(cache_dir, "signature.json")) as f:
+            if json.load(f) != json.loads(json.dumps(signature)):
+                return None
+        pos = np.load(os.path.join(cache_dir, "pos.npy"), mmap_mode='r')
+        cov = np.load(os.path.join(cache_dir, "cov.npy"), mmap_mode='r')
+        offsets = np.load(os.path.join(cache_dir, "offsets.npy"))
+        contigs = np.load(os.path.join(cache_dir, "contigs.npy")).tolist()
+        samples = np.load(os.path.join(cache_dir, "samples.npy")).tolist()
+        contig_idx = np.load(os.path.join(cache_dir, "contig_idx.npy")).tolist()
+        sample_idx = np.load(os.path.join(cache_dir, "sample_idx.npy")).tolist()
+    except (OSError, ValueError):
+        return None
+    
+    coverage_data = {}
+    for k, (ci, si) in enumerate(zip(contig_idx, sample_idx)):
+        lo, hi = offsets[k], offsets[k + 1]
+        coverage_data.setdefault(contigs[ci], {})[samples[si]] = SampleCoverage(pos[lo:hi], cov[lo:hi])
+    return coverage_data
+
+def _save_cache_array(cache_dir, name, array):
+    """Atomically replace one cached .npy file (other processes may still have it mapped)"""
+    tmp_path = os.path.join(cache_dir, name + ".npy.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, os.path.join(cache_dir, name + ".npy"))
+
+def _write_coverage_cache(cache_dir, signature, coverage_data):
+    """Store coverage arrays as flat .npy files that later runs can memory-map"""
+    contigs = list(coverage_data)
+    samples = sorted(set(sample for contig_data in coverage_data.values() for sample in contig_data))
+    sample_index = {sample: i for i, sample in enumerate(samples)}
+    pairs = [(ci, sample_index[sample], arr) for ci, contig in enumerate(contigs)
+             for sample, arr in coverage_data[contig].items()]
+    offsets = np.zeros(len(pairs) + 1, dtype=np.int64)
+    np.cumsum([arr.pos.size for _, _, arr in pairs], out=offsets[1:])
+    
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        signature_path = os.path.join(cache_dir, "signature.json")
+        if os.path.exists(signature_path):
+            os.remove(signature_path)
+        _save_cache_array(cache_dir, "pos", np.concatenate([arr.pos for _, _, arr in pairs] or [np.empty(0, np.int32)]))
+        _save_cache_array(cache_dir, "cov", np.concatenate([arr.cov for _, _, arr in pairs] or [np.empty(0, np.float32)]))
+        _save_cache_array(cache_dir, "offsets", offsets)
+        _save_cache_array(cache_dir, "contigs", np.array(contigs, dtype=str))
+        _save_cache_array(cache_dir, "samples", np.array(samples, dtype=str))
+        _save_cache_array(cache_dir, "contig_idx", np.array([ci for ci, _, _ in pairs], dtype=np.int32))
+        _save_cache_array(cache_dir, "sample_idx", np.array([si for _, si, _ in pairs], dtype=np.int32))
+        # Written last so a partially written cache is never considered fresh
+        with open(signature_path, 'w') as f:
+            json.dump(signature, f)
+    except OSError as e:
+        print(f"Warning: could not write coverage cache to {cache_dir}: {e}")
+
+def _compact_coverage(coverage_data):
+    """Store coverage as uint16 when every value is a whole depth that fits, halving its size"""
+    limit = np.iinfo(np.uint16).max
+    for contig_data in coverage_data.values():
+        for arr in contig_data.values():
+            if arr.cov.size and (arr.cov.min() < 0 or arr.cov.max() > limit or np.any(arr.cov != np.round(arr.cov))):
+                print("Coverage has fractional or >65535 values, keeping float32 arrays")
+                return coverage_data
+    return {contig: {sample: arr._replace(cov=arr.cov.astype(np.uint16)) for sample, arr in contig_data.items()}
+            for contig, contig_data in coverage_data.items()}
+
+def load_coverage_arrays(coverage_dir):
+    """Load unfiltered coverage as {contig: {sample: SampleCoverage}} through an on-disk cache.
+    
+    The first run parses the BED files and saves the arrays in COVERAGE_CACHE_DIR;
+    later runs memory-map them for as long as no coverage file has changed.
+    Integer read depths are stored as uint16, anything else as float32.
+    """
+    signature = _coverage_dir_signature(coverage_dir)
+    if not signature:
+        # Missing directory or no coverage files: nothing to load, and no cache to create
+        print(f"No coverage files found in {coverage_dir}")
+        return {}
+    cache_dir = os.path.join(coverage_dir, COVERAGE_CACHE_DIR)
+    
+    coverage_data = _read_coverage_cache(cache_dir, signature)
+    if coverage_data is not None:
+        print(f"Loaded cached coverage arrays from {cache_dir}")
+        return coverage_data
+    
+    coverage_data = None
+    if PYARROW_AVAILABLE:
+        try:
+            coverage_data = _load_coverage_arrays_arrow(coverage_dir)
+        except pa.ArrowInvalid as e:
+            print(f"Warning: PyArrow could not parse coverage files ({e}), falling back to the Python parser")
+    if coverage_data is None:
+        coverage_data = load_all_coverage_data(coverage_dir)
+    coverage_data = _compact_coverage(coverage_data)
+    _write_coverage_cache(cache_dir, signature, coverage_data)
+    return coverage_data
+
+@functools.lru_cache(maxsize=4)
+def _load_config_cached(config_path, signature):
+    return load_config(config_path)
+
+@functools.lru_cache(maxsize=1)
+def _load_coverage_cached(coverage_dir, signature):
+    return load_coverage_arrays(coverage_dir)
+
+def cached_load_config(config_path="config.yaml"):
+    """Load configuration, reusing the parsed result while the file is unchanged.
+
+    The returned dict is shared between callers and must not be modified.
+    """
+    config_path = os.path.abspath(config_path)
+    return _load_config_cached(config_path, _file_signature(config_path))
+
+def cached_load_coverage_data(coverage_dir):
+    """Load unfiltered coverage arrays, reusing them while no coverage file has changed.
+
+    The returned data is shared between callers and must not be modified.
+    """
+    coverage_dir = os.path.abspath(coverage_dir)
+    return _load_coverage_cached(coverage_dir, _coverage_dir_signature(coverage_dir))
+
 def main():
     parser = argparse.ArgumentParser(description='Generate interactive contig coverage visualization')
     parser.add_argument('--config', '-c', default='config.yaml', 
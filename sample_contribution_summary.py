@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
-from generate_interactive_html import load_all_coverage_data, load_config
+from generate_interactive_html import load_coverage_stats, load_config
 import csv
+from operator import itemgetter
+import numpy as np
 
 def analyze_sample_contributions():
     """Analyze which samples contribute to each contig"""
@@ -10,26 +12,21 @@ def analyze_sample_contributions():
     config = load_config('config.yaml')
     
     print("Loading coverage data...")
-    coverage_data = load_all_coverage_data(config['coverage_dir'])
+    stats = load_coverage_stats(config['coverage_dir'])
     
     print("Analyzing sample contributions...")
     
     # Create summary: which samples contribute to each contig
+    contributions = {contig: [] for contig in stats['contig']}
+    # Check if sample has meaningful coverage (>0 for significant portion), and only
+    # include it if mean coverage > 0.1 (filter out very low coverage)
+    for i in np.flatnonzero((stats['max'] > 0) & (stats['mean'] > 0.1)).tolist():
+        contributions[stats['contig'][i]].append((stats['sample'][i], float(stats['mean'][i]), float(stats['max'][i])))
+    
     results = []
-    for contig in coverage_data:
-        contributing_samples = []
-        for sample in coverage_data[contig]:
-            # Check if sample has meaningful coverage (>0 for significant portion)
-            coverages = [d['coverage'] for d in coverage_data[contig][sample]]
-            if any(c > 0 for c in coverages):
-                mean_cov = sum(coverages) / len(coverages)
-                max_cov = max(coverages)
-                # Only include if mean coverage > 0.1 (filter out very low coverage)
-                if mean_cov > 0.1:
-                    contributing_samples.append((sample, mean_cov, max_cov))
-        
+    for contig, contributing_samples in contributions.items():
         # Sort by mean coverage (highest first)
-        contributing_samples.sort(key=lambda x: x[1], reverse=True)
+        contributing_samples.sort(key=itemgetter(1), reverse=True)
         
         results.append({
             'contig': contig,
@@ -38,7 +35,7 @@ def analyze_sample_contributions():
         })
     
     # Sort by number of contributing samples (most broadly supported first)
-    results.sort(key=lambda x: x['num_contributing_samples'], reverse=True)
+    results.sort(key=itemgetter('num_contributing_samples'), reverse=True)
     
     print(f"\n{'='*60}")
     print("SAMPLE CONTRIBUTION SUMMARY")
@@ -66,13 +63,13 @@ def analyze_sample_contributions():
     csv_filename = 'sample_contributions_detailed.csv'
     print(f"Saving detailed results to {csv_filename}...")
     
-    with open(csv_filename, 'w', newline='') as csvfile:
+    with open(csv_filename, 'w', newline='', buffering=1 << 20) as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['Contig', 'Sample', 'Mean_Coverage', 'Max_Coverage', 'Rank'])
-        
-        for result in results:
-            for rank, (sample, mean_cov, max_cov) in enumerate(result['contributing_samples'], 1):
-                writer.writerow([result['contig'], sample, f"{mean_cov:.2f}", f"{max_cov:.2f}", rank])
+        writer.writerows(
+            (result['contig'], sample, f"{mean_cov:.2f}", f"{max_cov:.2f}", rank)
+            for result in results
+            for rank, (sample, mean_cov, max_cov) in enumerate(result['contributing_samples'], 1))
     
     print(f"✓ Analysis complete! Detailed results saved to {csv_filename}")
 
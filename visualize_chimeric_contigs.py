@@ -1,73 +1,41 @@
 #!/usr/bin/env python3
 
-from generate_interactive_html import load_all_coverage_data, load_config, generate_html, get_contigs_from_fasta
+from generate_interactive_html import cached_load_coverage_data, cached_load_config, generate_html, get_contigs_from_fasta
+from chimera_detection import contigs_to_screen, score_contigs
+from operator import itemgetter
 import sys
 
-def identify_chimeric_contigs(min_score=0.6):
-    """Identify potentially chimeric contigs using the screening algorithm"""
+def identify_chimeric_contigs(min_score=0.6, coverage_data=None, config=None):
+    """Identify potentially chimeric contigs; returns (chimeric_contigs, coverage_data, config)"""
     print("Screening for chimeric contigs...")
-    config = load_config('config.yaml')
-    coverage_data = load_all_coverage_data(config['coverage_dir'])
+    if config is None:
+        config = cached_load_config('config.yaml')
+    if coverage_data is None:
+        coverage_data = cached_load_coverage_data(config['coverage_dir'])
     
-    chimeric_contigs = []
+    # Divide into 5 segments and find the leading sample of each
+    num_segments = 5
+    min_segment_coverage = 5  # Lower threshold for screening
+    
+    # Skip very short contigs
+    screened_names, screened_contigs = contigs_to_screen(coverage_data)
     
-    for contig_name in coverage_data:
-        contig_data = coverage_data[contig_name]
-        
-        # Get all positions
-        all_positions = set()
-        for sample in contig_data:
-            for point in contig_data[sample]:
-                all_positions.add(point['position'])
-        
-        all_positions = sorted(all_positions)
-        contig_length = max(all_positions) if all_positions else 0
-        
-        if contig_length < 1000:  # Skip very short contigs
-            continue
-        
-        # Divide into 5 segments
-        num_segments = 5
-        segment_size = contig_length // num_segments
-        
-        segment_leaders = []
-        for seg_idx in range(num_segments):
-            seg_start = seg_idx * segment_size
-            seg_end = (seg_idx + 1) * segment_size if seg_idx < num_segments - 1 else contig_length
-            
-            segment_coverage = {}
-            for sample in contig_data:
-                total_cov = 0
-                positions_in_segment = 0
-                
-                for point in contig_data[sample]:
-                    if seg_start <= point['position'] < seg_end:
-                        total_cov += point['coverage']
-                        positions_in_segment += 1
-                
-                if positions_in_segment > 0:
-                    mean_cov = total_cov / positions_in_segment
-                    if mean_cov >= 5:  # Lower threshold for screening
-                        segment_coverage[sample] = mean_cov
-            
-            if segment_coverage:
-                leader = max(segment_coverage.items(), key=lambda x: x[1])
-                segment_leaders.append(leader[0])
-        
+    chimeric_contigs = []
+    leader_counts = score_contigs(screened_contigs, num_segments, min_segment_coverage)
+    for contig_name, (unique_leaders, led_segments) in zip(screened_names, leader_counts):
         # Score based on number of different leaders
-        unique_leaders = len(set(leader for leader in segment_leaders if leader is not None))
-        if len(segment_leaders) > 0:
-            chimera_score = unique_leaders / len(segment_leaders)
+        if led_segments > 0:
+            chimera_score = unique_leaders / led_segments
             if chimera_score >= min_score:
                 chimeric_contigs.append((contig_name, chimera_score, unique_leaders))
     
-    return sorted(chimeric_contigs, key=lambda x: x[1], reverse=True)
+    return sorted(chimeric_contigs, key=itemgetter(1), reverse=True), coverage_data, config
 
-def create_chimeric_visualization(min_score=0.6, output_suffix="chimeric"):
-    """Create visualization for only the chimeric contigs"""
+def create_chimeric_visualization(min_score=0.6, output_suffix="chimeric", coverage_data=None, config=None):
+    """Create visualization for only the chimeric contigs, optionally from already-loaded coverage and config"""
     
     # Identify chimeric contigs
-    chimeric_contigs = identify_chimeric_contigs(min_score)
+    chimeric_contigs, all_coverage_data, config = identify_chimeric_contigs(min_score, coverage_data, config)
     
     if not chimeric_contigs:
         print(f"No contigs found with chimera score >= {min_score}")
@@ -79,19 +47,13 @@ def create_chimeric_visualization(min_score=0.6, output_suffix="chimeric"):
     for name, score, leaders in chimeric_contigs:
         print(f"  {name}: score={score:.2f} ({leaders} different segment leaders)")
     
-    # Load all data
-    config = load_config('config.yaml')
-    all_coverage_data = load_all_coverage_data(config['coverage_dir'])
-    
     # Filter to only chimeric contigs
     filtered_coverage_data = {contig: all_coverage_data[contig] 
                             for contig in chimeric_names 
                             if contig in all_coverage_data}
     
     # Count total samples in filtered data
-    all_samples = set()
-    for contig_data in filtered_coverage_data.values():
-        all_samples.update(contig_data.keys())
+    all_samples = set().union(*filtered_coverage_data.values())
     
     print(f"Filtered dataset: {len(filtered_coverage_data)} contigs, {len(all_samples)} samples")
     
@@ -112,21 +74,27 @@ def create_chimeric_visualization(min_score=0.6, output_suffix="chimeric"):
     
     # Also create a summary report
     summary_filename = f"chimeric_contigs_summary_{output_suffix}.txt"
-    with open(summary_filename, 'w') as f:
-        f.write("CHIMERIC CONTIGS ANALYSIS SUMMARY\n")
-        f.write("="*50 + "\n\n")
-        f.write(f"Analysis parameters:\n")
-        f.write(f"  Minimum chimera score: {min_score}\n")
-        f.write(f"  Total contigs flagged: {len(chimeric_names)}\n")
-        f.write(f"  Total samples involved: {len(all_samples)}\n\n")
-        
-        f.write("Flagged contigs:\n")
-        f.write("-" * 50 + "\n")
-        for name, score, leaders in chimeric_contigs:
-            f.write(f"{name:<15} Score: {score:.2f}  Leaders: {leaders}\n")
-        
-        f.write(f"\nVisualization file: {output_filename}\n")
-        f.write("Open this HTML file in a web browser to explore the coverage patterns.\n")
+    lines = [
+        "CHIMERIC CONTIGS ANALYSIS SUMMARY",
+        "="*50,
+        "",
+        "Analysis parameters:",
+        f"  Minimum chimera score: {min_score}",
+        f"  Total contigs flagged: {len(chimeric_names)}",
+        f"  Total samples involved: {len(all_samples)}",
+        "",
+        "Flagged contigs:",
+        "-" * 50,
+    ]
+    lines.extend(f"{name:<15} Score: {score:.2f}  Leaders: {leaders}" for name, score, leaders in chimeric_contigs)
+    lines.extend([
+        "",
+        f"Visualization file: {output_filename}",
+        "Open this HTML file in a web browser to explore the coverage patterns.",
+        "",
+    ])
+    with open(summary_filename, 'w', buffering=1 << 20) as f:
+        f.write("\n".join(lines))
     
     print(f"✓ Summary report created: {summary_filename}")
 